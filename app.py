@@ -1,69 +1,213 @@
+import json
+import os
+import threading
+
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import numpy as np
 import pandas as pd
 from google.cloud import bigquery
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
 from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
 
 # ---------------------------
 # BigQuery client (from secrets or fallback)
 # ---------------------------
+BQ_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
 @st.cache_resource(show_spinner=False)
-def get_bq_client_and_project():
-    """Return (client, project_id) using Streamlit secrets when present."""
+def get_credentials_and_project():
+    """Return (credentials, project_id) using Streamlit secrets when present."""
     if "gcp_service_account" in st.secrets:
         info = st.secrets["gcp_service_account"]
-        creds = service_account.Credentials.from_service_account_info(info)
-        proj = info.get("project_id")
-        client = bigquery.Client(credentials=creds, project=proj, location="US")
-        return client, proj
-    # local fallback
-    proj = "big-query-fifa"
-    client = bigquery.Client(project=proj, location="US")
+        creds = service_account.Credentials.from_service_account_info(info, scopes=BQ_SCOPES)
+        return creds, info.get("project_id")
+    # local fallback: application default credentials. The project stays
+    # big-query-fifa unless a GOOGLE_APPLICATION_CREDENTIALS key file names one;
+    # it is read from the file itself, because google.auth.default() would
+    # prefer GOOGLE_CLOUD_PROJECT / the gcloud default project
+    creds, _ = google.auth.default(scopes=BQ_SCOPES)
+    key_file = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if key_file:
+        with open(key_file, encoding="utf-8") as f:
+            key_proj = json.load(f).get("project_id")
+        if key_proj:
+            return creds, key_proj
+    return creds, "big-query-fifa"
+
+@st.cache_resource(show_spinner=False)
+def get_bq_client_and_project():
+    """Return (client, project_id)."""
+    creds, proj = get_credentials_and_project()
+    # explicit keep-alive pool so warm calls across sessions reuse TLS connections
+    session = AuthorizedSession(creds)
+    session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=50))
+    client = bigquery.Client(credentials=creds, project=proj, location="US", _http=session)
     return client, proj
 
 
 client, PROJECT = get_bq_client_and_project()
 DATASET = "fifa_ds"
 
+# fail fast instead of billing a full scan if a query or table name goes wrong
+MAX_BYTES_BILLED = 50_000_000
+
+def run_df(sql: str, params: list | None = None) -> pd.DataFrame:
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=params or [], maximum_bytes_billed=MAX_BYTES_BILLED
+    )
+    # results here are small enough to come back in the first REST page (and
+    # query_and_wait's fast path has no destination table), so the Storage
+    # Read API would never be used; don't let to_dataframe try to create it
+    return client.query_and_wait(sql, job_config=job_config, location="US").to_dataframe(
+        create_bqstorage_client=False
+    )
+
 @st.cache_data(show_spinner=False, ttl=600)
-def resolve_table_ids(project: str, dataset: str):
+def run_df_cached(sql: str, params_tuple: tuple = ()) -> pd.DataFrame:
+    """
+    run_df memoized on the SQL text and parameters. Parameters are passed as
+    hashable (name, type, value) tuples and rebuilt as scalar parameters here.
     """
-    Detect which table exists: 'players' or 'player'.
+    params = [bigquery.ScalarQueryParameter(n, t, v) for n, t, v in params_tuple]
+    return run_df(sql, params)
+
+@st.cache_data(show_spinner=False, ttl=86400)
+def resolve_schema(project: str, dataset: str):
+    """
+    Detect which table exists ('players' or 'player') and its columns,
+    in one INFORMATION_SCHEMA query.
     Returns:
-      (table_backticked, table_plain_name)
-      e.g. ("`proj.ds.players`", "proj.ds.players")
+      (table_backticked, table_plain_name, short_name, lower-cased column set)
+      e.g. ("`proj.ds.players`", "proj.ds.players", "players", {"age", ...})
     """
     dataset_ref = f"{project}.{dataset}"
-    found = set(t.table_id.lower() for t in client.list_tables(dataset_ref))
+    df = run_df(f"""
+    SELECT LOWER(table_name) AS table_name, ARRAY_AGG(LOWER(column_name)) AS cols
+    FROM `{dataset_ref}`.INFORMATION_SCHEMA.COLUMNS
+    WHERE LOWER(table_name) IN ('players', 'player')
+    GROUP BY 1
+    """)
+    found = dict(zip(df["table_name"], df["cols"]))
     chosen = None
     for cand in ("players", "player"):
         if cand in found:
             chosen = cand
             break
     if not chosen:
-        raise RuntimeError(
-            f"No table named 'players' or 'player' in {dataset_ref}. "
-            f"Found: {sorted(found)}"
-        )
+        raise RuntimeError(f"No table named 'players' or 'player' in {dataset_ref}.")
     plain = f"{project}.{dataset}.{chosen}"
     ticked = f"`{plain}`"
-    return ticked, plain, chosen  # backticked, plain, short name
+    return ticked, plain, chosen, set(found[chosen])
 
-TABLE, TABLE_PLAIN, TABLE_SHORT = resolve_table_ids(PROJECT, DATASET)
+TABLE, TABLE_PLAIN, TABLE_SHORT, AVAILABLE_COLS = resolve_schema(PROJECT, DATASET)
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def existing_tables(project: str, dataset: str, names: tuple[str, ...]) -> set[str]:
+    """Which of `names` exist in the dataset (one bounded INFORMATION_SCHEMA probe)."""
+    df = run_df(
+        f"""
+        SELECT LOWER(table_name) AS table_name
+        FROM `{project}.{dataset}`.INFORMATION_SCHEMA.TABLES
+        WHERE LOWER(table_name) IN UNNEST(@names)
+        """,
+        [bigquery.ArrayQueryParameter("names", "STRING", list(names))],
+    )
+    return set(df["table_name"])
 
 # model stays the same dataset
-MODEL = f"`{PROJECT}.{DATASET}.player_value_model`"
+MODEL_PLAIN = f"{PROJECT}.{DATASET}.player_value_model"
+MODEL = f"`{MODEL_PLAIN}`"
+
+# nightly pre-aggregates (see sql/eda_aggregates.sql); optional
+AGG_VALUE_HIST = "players_value_hist"
+AGG_TOP_NATIONALITY = "players_top_nationality"
+
+# value buckets are labelled client-side from a per-€1M histogram;
+# edges must stay on whole millions
+VALUE_BINS = [0, 1e6, 5e6, 1e7, 2e7, 5e7, np.inf]
+VALUE_LABELS = ["<1M", "1M–5M", "5M–10M", "10M–20M", "20M–50M", "≥50M"]
+
+# sidebar starting values, in predict_value argument order
+PREDICT_DEFAULTS = {
+    "age": 24, "overall": 86, "potential": 92, "skill_moves": 4, "wage_eur": 120_000,
+    "international_reputation": 3, "weak_foot": 4, "pace": 85, "shooting": 80,
+    "passing": 82, "dribbling": 86, "defending": 60, "physic": 78,
+}
+PREDICT_FEATURES = tuple(PREDICT_DEFAULTS)
+PREDICT_PARAM_SCHEMA = tuple((name, "INT64") for name in PREDICT_FEATURES)
+
+# built once: identical text on every call, only the parameters change
+SQL_PREDICT = f"""
+SELECT *
+FROM ML.PREDICT(
+  MODEL {MODEL},
+  (
+    SELECT
+      @age AS age,
+      @overall AS overall,
+      @potential AS potential,
+      @skill_moves AS skill_moves,
+      @wage_eur AS wage_eur,
+      @international_reputation AS international_reputation,
+      @weak_foot AS weak_foot,
+      @pace AS pace,
+      @shooting AS shooting,
+      @passing AS passing,
+      @dribbling AS dribbling,
+      @defending AS defending,
+      @physic AS physic
+  )
+)
+"""
 
 # ---------------------------
 # Helpers
 # ---------------------------
-def run_df(sql: str, params: list | None = None) -> pd.DataFrame:
-    job_config = bigquery.QueryJobConfig(query_parameters=params or [])
-    return client.query(sql, job_config=job_config, location="US").to_dataframe()
-
-@st.cache_data(show_spinner=False, ttl=300)
-def list_columns() -> set[str]:
-    tbl = client.get_table(TABLE_PLAIN)  # use detected table
-    return {c.name.lower() for c in tbl.schema}
+def load_eda(
+    sql_buckets: str, sql_top: str, sql_scatter: str | None
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Run the EDA queries as one job: a tagged UNION ALL that is split back
+    into (buckets, top groups, scatter) client-side. The top-group query
+    must expose an `ord` column, since row order is lost in the union.
+    """
+    sql = f"""
+    WITH b AS ({sql_buckets}),
+         t AS ({sql_top}),
+         s AS ({sql_scatter or "SELECT NULL AS x, NULL AS value_eur LIMIT 0"})
+    SELECT 'bucket' AS k, CAST(NULL AS STRING) AS grp, CAST(NULL AS INT64) AS ord,
+           CAST(value_m AS FLOAT64) AS x, CAST(player_count AS FLOAT64) AS y
+    FROM b
+    UNION ALL
+    SELECT 'top', CAST(grp AS STRING), ord, NULL, CAST(avg_value AS FLOAT64)
+    FROM t
+    UNION ALL
+    SELECT 'scatter', NULL, NULL, CAST(x AS FLOAT64), CAST(value_eur AS FLOAT64)
+    FROM s
+    """
+    df = run_df_cached(sql)
+    hist = df[df["k"] == "bucket"]
+    df_buckets = (
+        hist.assign(value_bucket=pd.cut(hist["x"] * 1e6, VALUE_BINS, labels=VALUE_LABELS, right=False))
+        .groupby("value_bucket", observed=False)["y"].sum()
+        .astype("int64")
+        .rename("player_count")
+        .reset_index()
+    )
+    df_top = (
+        df[df["k"] == "top"].sort_values("ord")
+        .rename(columns={"y": "avg_value"})[["grp", "avg_value"]]
+        .reset_index(drop=True)
+    )
+    df_scatter = (
+        df[df["k"] == "scatter"]
+        .rename(columns={"y": "value_eur"})[["x", "value_eur"]]
+        .reset_index(drop=True)
+    )
+    return df_buckets, df_top, df_scatter
 
 def first_existing(candidates: list[str], available: set[str]) -> str | None:
     for c in candidates:
@@ -71,50 +215,248 @@ def first_existing(candidates: list[str], available: set[str]) -> str | None:
             return c
     return None
 
+@st.cache_resource(show_spinner=False, ttl=86400)
+def fetch_linear_weights() -> tuple[np.ndarray, float] | None:
+    """
+    Return (weights in PREDICT_FEATURES order, intercept) for a linear_reg
+    model, or None when the model can't be evaluated as w·x + b locally
+    (another model type, or inputs reshaped by a TRANSFORM clause).
+    Errors propagate and are not cached; see load_linear_weights.
+    """
+    model = client.get_model(MODEL_PLAIN)
+    if model.model_type != "LINEAR_REGRESSION":
+        return None
+    # TRANSFORM may keep the input names (e.g. ML.STANDARD_SCALER(age) AS age),
+    # so the weights would apply to transformed values, not the raw inputs
+    if model.transform_columns:
+        return None
+    df = run_df(f"SELECT processed_input, weight FROM ML.WEIGHTS(MODEL {MODEL})")
+    weights = dict(zip(df["processed_input"].str.lower(), df["weight"]))
+    intercept = weights.pop("__intercept__", None)
+    if intercept is None or set(weights) != set(PREDICT_FEATURES):
+        return None
+    w = np.array([weights[f] for f in PREDICT_FEATURES], dtype=np.float64)
+    if not np.isfinite(w).all():
+        return None
+    return w, float(intercept)
+
+@st.cache_resource(show_spinner=False, ttl=300)
+def load_linear_weights() -> tuple[np.ndarray, float] | None:
+    """
+    fetch_linear_weights, with failures (e.g. no model-metadata permission)
+    cached as None for 5 minutes so reruns don't repeat the failing calls.
+    """
+    try:
+        return fetch_linear_weights()
+    except Exception:
+        return None
+
 def predict_value(
     age:int, overall:int, potential:int, skill_moves:int, wage_eur:int,
     international_reputation:int, weak_foot:int, pace:int, shooting:int,
     passing:int, dribbling:int, defending:int, physic:int
 ) -> float:
-    sql_predict = f"""
-    SELECT *
-    FROM ML.PREDICT(
-      MODEL {MODEL},
-      (
-        SELECT
-          @age AS age,
-          @overall AS overall,
-          @potential AS potential,
-          @skill_moves AS skill_moves,
-          @wage_eur AS wage_eur,
-          @international_reputation AS international_reputation,
-          @weak_foot AS weak_foot,
-          @pace AS pace,
-          @shooting AS shooting,
-          @passing AS passing,
-          @dribbling AS dribbling,
-          @defending AS defending,
-          @physic AS physic
-      )
-    )
     """
-    params = [
-        bigquery.ScalarQueryParameter("age", "INT64", age),
-        bigquery.ScalarQueryParameter("overall", "INT64", overall),
-        bigquery.ScalarQueryParameter("potential", "INT64", potential),
-        bigquery.ScalarQueryParameter("skill_moves", "INT64", skill_moves),
-        bigquery.ScalarQueryParameter("wage_eur", "INT64", wage_eur),
-        bigquery.ScalarQueryParameter("international_reputation", "INT64", international_reputation),
-        bigquery.ScalarQueryParameter("weak_foot", "INT64", weak_foot),
-        bigquery.ScalarQueryParameter("pace", "INT64", pace),
-        bigquery.ScalarQueryParameter("shooting", "INT64", shooting),
-        bigquery.ScalarQueryParameter("passing", "INT64", passing),
-        bigquery.ScalarQueryParameter("dribbling", "INT64", dribbling),
-        bigquery.ScalarQueryParameter("defending", "INT64", defending),
-        bigquery.ScalarQueryParameter("physic", "INT64", physic),
+    Predict locally from the model weights when it is a plain linear_reg
+    (exact, no BigQuery job). Otherwise go through the ML.PREDICT cache,
+    with wage rounded to the nearest €1,000 so near-identical inputs share
+    an entry (the effect on the prediction is negligible). Skill ratings
+    stay exact: one point moves the value visibly.
+    """
+    linear = load_linear_weights()
+    if linear is not None:
+        w, b = linear
+        x = np.array([
+            age, overall, potential, skill_moves, wage_eur,
+            international_reputation, weak_foot, pace, shooting,
+            passing, dribbling, defending, physic
+        ], dtype=np.float64)
+        return float(w @ x + b)
+    return predict_cached(
+        age, overall, potential, skill_moves, int(round(wage_eur, -3)),
+        international_reputation, weak_foot, pace, shooting,
+        passing, dribbling, defending, physic
+    )
+
+def predict_params(values: tuple) -> list[bigquery.ScalarQueryParameter]:
+    """ML.PREDICT query parameters for values in PREDICT_FEATURES order."""
+    return [
+        bigquery.ScalarQueryParameter(name, typ, v)
+        for (name, typ), v in zip(PREDICT_PARAM_SCHEMA, values)
     ]
-    df_pred = run_df(sql_predict, params)
-    return float(df_pred.iloc[0]["predicted_value_eur"])
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=4096)
+def predict_cached(
+    age:int, overall:int, potential:int, skill_moves:int, wage_eur:int,
+    international_reputation:int, weak_foot:int, pace:int, shooting:int,
+    passing:int, dribbling:int, defending:int, physic:int
+) -> float:
+    params = predict_params((
+        age, overall, potential, skill_moves, wage_eur,
+        international_reputation, weak_foot, pace, shooting,
+        passing, dribbling, defending, physic
+    ))
+    # one row back: read it off the row iterator instead of building a DataFrame
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=params, maximum_bytes_billed=MAX_BYTES_BILLED
+    )
+    rows = client.query_and_wait(SQL_PREDICT, job_config=job_config, location="US")
+    row = next(iter(rows), None)
+    if row is None:
+        raise RuntimeError(f"ML.PREDICT on {MODEL_PLAIN} returned no rows.")
+    return float(row["predicted_value_eur"])
+
+def build_eda_sql():
+    """
+    Build the EDA queries for the detected schema.
+    Returns:
+      (top_chart_label, scatter_x_col, sql_buckets, sql_top, sql_scatter)
+    """
+    available_cols = AVAILABLE_COLS
+    agg_tables = existing_tables(PROJECT, DATASET, (AGG_VALUE_HIST, AGG_TOP_NATIONALITY))
+
+    # 1) Value histogram in €1M steps (pre-aggregated table when the nightly job has run)
+    if AGG_VALUE_HIST in agg_tables:
+        sql_buckets = f"""
+        SELECT value_m, player_count
+        FROM `{PROJECT}.{DATASET}.{AGG_VALUE_HIST}`
+        """
+    else:
+        sql_buckets = f"""
+        SELECT CAST(FLOOR(value_eur / 1000000) AS INT64) AS value_m, COUNT(*) AS player_count
+        FROM {TABLE}
+        WHERE value_eur IS NOT NULL
+        GROUP BY value_m
+        """
+
+    # 2) Top-10 group (nationality -> club/league -> age group)
+    dim = first_existing(["nationality_name", "nationality"], available_cols)
+    label = None
+    sql_top = None
+
+    if dim and AGG_TOP_NATIONALITY in agg_tables:
+        label = "Top 10 nationalities by average value (€)"
+        sql_top = f"""
+        SELECT grp, avg_value, num_players,
+          ROW_NUMBER() OVER (ORDER BY avg_value DESC) AS ord
+        FROM `{PROJECT}.{DATASET}.{AGG_TOP_NATIONALITY}`
+        """
+    elif dim:
+        label = "Top 10 nationalities by average value (€)"
+        sql_top = f"""
+        SELECT
+          {dim} AS grp,
+          AVG(value_eur) AS avg_value,
+          COUNT(*) AS num_players,
+          ROW_NUMBER() OVER (ORDER BY AVG(value_eur) DESC) AS ord
+        FROM {TABLE}
+        WHERE value_eur IS NOT NULL AND {dim} IS NOT NULL
+        GROUP BY grp
+        HAVING COUNT(*) >= 30
+        ORDER BY avg_value DESC
+        LIMIT 10
+        """
+    else:
+        dim = first_existing(["club_name", "league_name"], available_cols)
+        if dim:
+            label = f"Top 10 by average value (€) — grouped by {dim}"
+            sql_top = f"""
+            SELECT
+              {dim} AS grp,
+              AVG(value_eur) AS avg_value,
+              COUNT(*) AS num_players,
+              ROW_NUMBER() OVER (ORDER BY AVG(value_eur) DESC) AS ord
+            FROM {TABLE}
+            WHERE value_eur IS NOT NULL AND {dim} IS NOT NULL
+            GROUP BY grp
+            HAVING COUNT(*) >= 20
+            ORDER BY avg_value DESC
+            LIMIT 10
+            """
+
+    if not sql_top:
+        label = "Top age groups by average value (€)"
+        sql_top = f"""
+        WITH base AS (
+          SELECT
+            CASE
+              WHEN age IS NULL THEN 'Unknown'
+              WHEN age < 20 THEN '<20'
+              WHEN age BETWEEN 20 AND 22 THEN '20–22'
+              WHEN age BETWEEN 23 AND 25 THEN '23–25'
+              WHEN age BETWEEN 26 AND 28 THEN '26–28'
+              WHEN age BETWEEN 29 AND 31 THEN '29–31'
+              ELSE '32+'
+            END AS age_group,
+            value_eur
+          FROM {TABLE}
+          WHERE value_eur IS NOT NULL
+        )
+        SELECT age_group AS grp,
+               AVG(value_eur) AS avg_value,
+               COUNT(*) AS num_players,
+               CASE age_group
+                 WHEN '<20' THEN 1
+                 WHEN '20–22' THEN 2
+                 WHEN '23–25' THEN 3
+                 WHEN '26–28' THEN 4
+                 WHEN '29–31' THEN 5
+                 ELSE 6
+               END AS ord
+        FROM base
+        GROUP BY age_group
+        ORDER BY ord
+        LIMIT 10
+        """
+
+    # 3) Scatter (overall preferred, else potential)
+    x_col = "overall" if "overall" in available_cols else ("potential" if "potential" in available_cols else None)
+    sql_scatter = None
+    if x_col:
+        # hash a player id when there is one, so equal (x, value) pairs aren't sampled together
+        key = first_existing(["sofifa_id", "player_id", "long_name", "short_name"], available_cols)
+        hashed = ", ".join(c for c in (key, x_col, "value_eur") if c)
+        sql_scatter = f"""
+        SELECT {x_col} AS x, value_eur
+        FROM {TABLE}
+        WHERE value_eur IS NOT NULL AND {x_col} IS NOT NULL
+          -- deterministic ~1,800-row hash sample instead of sorting the whole table;
+          -- unlike RAND() it keeps the EDA job eligible for BigQuery's results cache.
+          -- LIMIT is only a safety cap (no ORDER BY, so it must not do the sampling)
+          AND ABS(MOD(FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({hashed}))), 1000000))
+              < SAFE_DIVIDE(1800 * 1000000, (SELECT COUNT(*) FROM {TABLE}))
+        LIMIT 2000
+        """
+
+    return label, x_col, sql_buckets, sql_top, sql_scatter
+
+@st.cache_resource(show_spinner=False)
+def warm_caches():
+    """
+    Once per process, fill the default prediction and the EDA panel caches
+    in background threads so the first viewer doesn't wait on cold jobs.
+    Daemon threads: a hung warm-up job must not block interpreter shutdown.
+    The threads carry this run's ScriptRunContext: without one, Streamlit's
+    caches neither read nor store results, and the warm-up would be wasted.
+    """
+    def warm(fn, *args):
+        try:
+            fn(*args)
+        except Exception:
+            pass  # the foreground call surfaces the error
+
+    def warm_eda():
+        warm(load_eda, *build_eda_sql()[2:])
+
+    ctx = get_script_run_ctx()
+    for t in (
+        threading.Thread(target=warm, args=(predict_value, *PREDICT_DEFAULTS.values()), daemon=True),
+        threading.Thread(target=warm_eda, daemon=True),
+    ):
+        add_script_run_ctx(t, ctx)
+        t.start()
+
+warm_caches()
 
 # ---------------------------
 # Page layout & header
@@ -127,33 +469,26 @@ st.caption("Prediction powered by BigQuery ML • Data: FIFA 21 (Kaggle)")
 # Sidebar — prediction inputs
 # ---------------------------
 st.sidebar.header("Predict Player Market Value (€)")
-age = st.sidebar.number_input("Age", 15, 45, 24)
-overall = st.sidebar.number_input("Overall", 40, 95, 86)
-potential = st.sidebar.number_input("Potential", 40, 95, 92)
-skill_moves = st.sidebar.number_input("Skill Moves", 1, 5, 4)
-wage_eur = st.sidebar.number_input("Wage (EUR / week)", 0, 1_000_000, 120_000, step=5_000)
-international_reputation = st.sidebar.number_input("International Reputation", 1, 5, 3)
-weak_foot = st.sidebar.number_input("Weak Foot", 1, 5, 4)
-pace = st.sidebar.number_input("Pace", 1, 99, 85)
-shooting = st.sidebar.number_input("Shooting", 1, 99, 80)
-passing = st.sidebar.number_input("Passing", 1, 99, 82)
-dribbling = st.sidebar.number_input("Dribbling", 1, 99, 86)
-defending = st.sidebar.number_input("Defending", 1, 99, 60)
-physic = st.sidebar.number_input("Physic", 1, 99, 78)
-
-# First render: compute once so the metric shows immediately
-if "pred_val" not in st.session_state:
-    try:
-        st.session_state.pred_val = predict_value(
-            age, overall, potential, skill_moves, wage_eur,
-            international_reputation, weak_foot, pace, shooting,
-            passing, dribbling, defending, physic
-        )
-    except Exception as e:
-        st.session_state.pred_val = None
-        st.warning(f"Prediction not available: {e}")
+# A form batches input edits: the script only reruns on submit
+with st.sidebar.form("predict_form"):
+    age = st.number_input("Age", 15, 45, PREDICT_DEFAULTS["age"])
+    overall = st.number_input("Overall", 40, 95, PREDICT_DEFAULTS["overall"])
+    potential = st.number_input("Potential", 40, 95, PREDICT_DEFAULTS["potential"])
+    skill_moves = st.number_input("Skill Moves", 1, 5, PREDICT_DEFAULTS["skill_moves"])
+    wage_eur = st.number_input("Wage (EUR / week)", 0, 1_000_000, PREDICT_DEFAULTS["wage_eur"], step=5_000)
+    international_reputation = st.number_input("International Reputation", 1, 5, PREDICT_DEFAULTS["international_reputation"])
+    weak_foot = st.number_input("Weak Foot", 1, 5, PREDICT_DEFAULTS["weak_foot"])
+    pace = st.number_input("Pace", 1, 99, PREDICT_DEFAULTS["pace"])
+    shooting = st.number_input("Shooting", 1, 99, PREDICT_DEFAULTS["shooting"])
+    passing = st.number_input("Passing", 1, 99, PREDICT_DEFAULTS["passing"])
+    dribbling = st.number_input("Dribbling", 1, 99, PREDICT_DEFAULTS["dribbling"])
+    defending = st.number_input("Defending", 1, 99, PREDICT_DEFAULTS["defending"])
+    physic = st.number_input("Physic", 1, 99, PREDICT_DEFAULTS["physic"])
+    submitted = st.form_submit_button("Predict value")
 
-if st.sidebar.button("Predict value"):
+# First render shows the defaults; after that only "Predict value" re-predicts.
+# predict_value is cached, so repeated combinations skip the BigQuery round-trip.
+if submitted or "pred_val" not in st.session_state:
     try:
         st.session_state.pred_val = predict_value(
             age, overall, potential, skill_moves, wage_eur,
@@ -162,154 +497,46 @@ if st.sidebar.button("Predict value"):
         )
     except Exception as e:
         st.session_state.pred_val = None
-        st.warning(f"Prediction failed: {e}")
+        st.warning(f"Prediction not available: {e}")
 
 # Top metric
 if st.session_state.pred_val is not None:
     st.metric("Predicted Market Value (€)", f"{st.session_state.pred_val:,.0f}")
 
 st.markdown("---")
-st.subheader("Exploratory Analysis (live from BigQuery)")
-
-available_cols = list_columns()
-
-# 1) Value buckets
-sql_buckets = f"""
-WITH buckets AS (
-  SELECT
-    CASE
-      WHEN value_eur < 1000000 THEN '<1M'
-      WHEN value_eur < 5000000 THEN '1M–5M'
-      WHEN value_eur < 10000000 THEN '5M–10M'
-      WHEN value_eur < 20000000 THEN '10M–20M'
-      WHEN value_eur < 50000000 THEN '20M–50M'
-      ELSE '≥50M'
-    END AS value_bucket
-  FROM {TABLE}
-  WHERE value_eur IS NOT NULL
-)
-SELECT value_bucket, COUNT(*) AS player_count
-FROM buckets
-GROUP BY value_bucket
-ORDER BY
-  CASE value_bucket
-    WHEN '<1M' THEN 1
-    WHEN '1M–5M' THEN 2
-    WHEN '5M–10M' THEN 3
-    WHEN '10M–20M' THEN 4
-    WHEN '20M–50M' THEN 5
-    ELSE 6
-  END
-"""
-df_buckets = run_df(sql_buckets)
 
-# 2) Top-10 group (nationality -> club/league -> age group)
-dim = first_existing(["nationality_name", "nationality"], available_cols)
-label = None
-sql_top = None
+def render_eda():
+    """Draw the EDA charts for the detected schema."""
+    label, x_col, sql_buckets, sql_top, sql_scatter = build_eda_sql()
+    df_buckets, df_top, df_scatter = load_eda(sql_buckets, sql_top, sql_scatter)
 
-if dim:
-    label = "Top 10 nationalities by average value (€)"
-    sql_top = f"""
-    SELECT
-      {dim} AS grp,
-      AVG(value_eur) AS avg_value,
-      COUNT(*) AS num_players
-    FROM {TABLE}
-    WHERE value_eur IS NOT NULL AND {dim} IS NOT NULL
-    GROUP BY grp
-    HAVING COUNT(*) >= 30
-    ORDER BY avg_value DESC
-    LIMIT 10
-    """
-else:
-    dim = first_existing(["club_name", "league_name"], available_cols)
-    if dim:
-        label = f"Top 10 by average value (€) — grouped by {dim}"
-        sql_top = f"""
-        SELECT
-          {dim} AS grp,
-          AVG(value_eur) AS avg_value,
-          COUNT(*) AS num_players
-        FROM {TABLE}
-        WHERE value_eur IS NOT NULL AND {dim} IS NOT NULL
-        GROUP BY grp
-        HAVING COUNT(*) >= 20
-        ORDER BY avg_value DESC
-        LIMIT 10
-        """
+    # --- Layout ---
+    col1, col2 = st.columns(2, gap="large")
+    with col1:
+        st.caption("Player count by value bucket")
+        st.bar_chart(df_buckets.set_index("value_bucket"))
 
-if not sql_top:
-    label = "Top age groups by average value (€)"
-    sql_top = f"""
-    WITH base AS (
-      SELECT
-        CASE
-          WHEN age IS NULL THEN 'Unknown'
-          WHEN age < 20 THEN '<20'
-          WHEN age BETWEEN 20 AND 22 THEN '20–22'
-          WHEN age BETWEEN 23 AND 25 THEN '23–25'
-          WHEN age BETWEEN 26 AND 28 THEN '26–28'
-          WHEN age BETWEEN 29 AND 31 THEN '29–31'
-          ELSE '32+'
-        END AS age_group,
-        value_eur
-      FROM {TABLE}
-      WHERE value_eur IS NOT NULL
-    )
-    SELECT age_group AS grp,
-           AVG(value_eur) AS avg_value,
-           COUNT(*) AS num_players
-    FROM base
-    GROUP BY age_group
-    ORDER BY
-      CASE age_group
-        WHEN '<20' THEN 1
-        WHEN '20–22' THEN 2
-        WHEN '23–25' THEN 3
-        WHEN '26–28' THEN 4
-        WHEN '29–31' THEN 5
-        ELSE 6
-      END
-    LIMIT 10
-    """
+    with col2:
+        if df_top.empty:
+            st.info(
+                "This table has neither 'nationality' nor 'nationality_name' and also lacks "
+                "fallback columns ('club_name' / 'league_name'). — chart skipped."
+            )
+        else:
+            st.caption(label)
+            st.bar_chart(df_top.set_index("grp")["avg_value"])
 
-df_top = run_df(sql_top)
-
-# 3) Scatter (overall preferred, else potential)
-x_col = "overall" if "overall" in available_cols else ("potential" if "potential" in available_cols else None)
-df_scatter = pd.DataFrame()
-if x_col:
-    sql_scatter = f"""
-    SELECT {x_col} AS x, value_eur
-    FROM {TABLE}
-    WHERE value_eur IS NOT NULL AND {x_col} IS NOT NULL
-    ORDER BY RAND()
-    LIMIT 2000
-    """
-    df_scatter = run_df(sql_scatter)
-
-# --- Layout ---
-col1, col2 = st.columns(2, gap="large")
-with col1:
-    st.caption("Player count by value bucket")
-    st.bar_chart(df_buckets.set_index("value_bucket"))
-
-with col2:
-    if df_top.empty:
-        st.info(
-            "This table has neither 'nationality' nor 'nationality_name' and also lacks "
-            "fallback columns ('club_name' / 'league_name'). — chart skipped."
-        )
+    st.caption("Overall vs Value (sampled)" if x_col == "overall" else "Potential vs Value (sampled)")
+    if df_scatter.empty:
+        st.info("Missing both 'overall' and 'potential' — scatter skipped.")
     else:
-        st.caption(label)
-        st.bar_chart(df_top.set_index("grp")["avg_value"])
-
-st.caption("Overall vs Value (sampled)" if x_col == "overall" else "Potential vs Value (sampled)")
-if df_scatter.empty:
-    st.info("Missing both 'overall' and 'potential' — scatter skipped.")
-else:
-    st.scatter_chart(df_scatter.rename(columns={"x": x_col}), x=x_col, y="value_eur")
+        st.scatter_chart(df_scatter.rename(columns={"x": x_col}), x=x_col, y="value_eur")
+
+
+# Queries only run once the user opts in, not on every sidebar rerun
+with st.expander("Exploratory Analysis (live from BigQuery)", expanded=False):
+    if st.toggle("Load charts", key="show_eda"):
+        render_eda()
 
 st.markdown("---")
 st.caption(f"Model: BigQuery ML linear_reg • Table: {TABLE_PLAIN}")
@@ -1,4 +1,6 @@
 # diag_app.py
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 from google.cloud import bigquery
 from google.oauth2 import service_account
@@ -45,11 +47,11 @@ st.write(f"**Credential email:** {cred_email if ok_secrets else 'N/A'}")
 
 def run_query(client_: bigquery.Client, sql: str):
     """
-    执行查询。注意：location 需要作为 client.query 的参数传入，
+    执行查询。注意：location 需要作为 client.query_and_wait 的参数传入，
     不能放进 QueryJobConfig（否则会报 unknown property）。
     """
-    job = client_.query(sql, location=BQ_LOCATION)
-    return job.result().to_dataframe(create_bqstorage_client=False)
+    rows = client_.query_and_wait(sql, location=BQ_LOCATION)
+    return rows.to_dataframe(create_bqstorage_client=False)
 
 def fq(project: str, dataset: str, name: str) -> str:
     return f"`{project}.{dataset}.{name}`"
@@ -57,11 +59,21 @@ def fq(project: str, dataset: str, name: str) -> str:
 FQ_TABLE = fq(project_id, DATASET, TABLE)
 FQ_MODEL = fq(project_id, DATASET, MODEL)
 
+# ---------- 三个探测并发提交，下面各节按顺序取结果 ----------
+probes = {}
+if ok_secrets and client:
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        probes = {
+            "ping": ex.submit(run_query, client, "SELECT 1 AS ok"),
+            "table": ex.submit(run_query, client, f"SELECT * FROM {FQ_TABLE} LIMIT 1"),
+            "model": ex.submit(run_query, client, f"SELECT * FROM ML.WEIGHTS(MODEL {FQ_MODEL}) LIMIT 10"),
+        }
+
 # ---------- 1) BigQuery ping ----------
 st.subheader("1) BigQuery ping")
 if ok_secrets and client:
     try:
-        df = run_query(client, "SELECT 1 AS ok")
+        df = probes["ping"].result()
         st.success("✅ Query job succeeded.")
         st.dataframe(df, use_container_width=True)
     except Exception as e:
@@ -75,7 +87,7 @@ st.subheader("2) Read a row from table")
 st.caption(f"{project_id}.{DATASET}.{TABLE}")
 if ok_secrets and client:
     try:
-        df = run_query(client, f"SELECT * FROM {FQ_TABLE} LIMIT 1")
+        df = probes["table"].result()
         st.success("✅ Table read succeeded.")
         st.dataframe(df, use_container_width=True)
     except Exception as e:
@@ -89,7 +101,7 @@ st.subheader("3) Probe model (ML.WEIGHTS)")
 st.caption(f"{project_id}.{DATASET}.{MODEL}")
 if ok_secrets and client:
     try:
-        dfw = run_query(client, f"SELECT * FROM ML.WEIGHTS(MODEL {FQ_MODEL}) LIMIT 10")
+        dfw = probes["model"].result()
         st.success("✅ Model probe succeeded.")
         st.dataframe(dfw, use_container_width=True)
     except Exception as e:
@@ -0,0 +1,26 @@
+-- Nightly scheduled query: pre-aggregates for the EDA panel in app.py.
+-- The dashboard reads these small tables when they exist and falls back
+-- to live aggregation over `players` otherwise.
+-- (Materialized views can't hold ORDER BY / HAVING / LIMIT, hence tables.)
+
+-- Per-€1M histogram; app.py folds it into labelled buckets with pd.cut.
+CREATE OR REPLACE TABLE `fifa_ds.players_value_hist` AS
+SELECT
+  CAST(FLOOR(value_eur / 1000000) AS INT64) AS value_m,
+  COUNT(*) AS player_count
+FROM `fifa_ds.players`
+WHERE value_eur IS NOT NULL
+GROUP BY value_m;
+
+-- FIFA 21 exports name the column `nationality`; use `nationality_name` for FIFA 22+.
+CREATE OR REPLACE TABLE `fifa_ds.players_top_nationality` AS
+SELECT
+  nationality AS grp,
+  AVG(value_eur) AS avg_value,
+  COUNT(*) AS num_players
+FROM `fifa_ds.players`
+WHERE value_eur IS NOT NULL AND nationality IS NOT NULL
+GROUP BY grp
+HAVING COUNT(*) >= 30
+ORDER BY avg_value DESC
+LIMIT 10;